@@ -1,12 +1,92 @@
 import argparse
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from gptcx.dem import DEM_MODES
+from gptcx.dem import REPLACE_MODE
+from gptcx.spatial import DEFAULT_OVERLAP_TOLERANCE
+
+
+def polygon_vertices(
+    parser: argparse.ArgumentParser, values: Optional[List[float]]
+) -> Optional[List[Tuple[float, float]]]:
+    """Pairs up a flat 'LAT LON LAT LON ...' list into polygon vertices"""
+    if values is None:
+        return None
+
+    if len(values) % 2 or len(values) < 6:
+        parser.error(
+            "argument --polygon: expected at least 3 'LAT LON' vertices. "
+            f"Got: {values}"
+        )
+
+    return list(zip(values[::2], values[1::2]))
 
 
 def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("input_dir", help="Input directory with GPX files to merge")
-    parser.add_argument("output_file", help="Output GPX merged file")
+    parser.add_argument(
+        "output_file",
+        help="Output merged file. Use a '.parquet' or '.arrow' suffix for a "
+        "columnar (analytics) output instead of GPX",
+    )
     parser.add_argument(
         "--filter-zeros", action="store_true", help="Filter heart rate zero values"
     )
+    parser.add_argument(
+        "--dem-dir",
+        help="Directory with SRTM '.hgt' tiles to correct the merged elevation",
+    )
+    parser.add_argument(
+        "--dem-mode",
+        choices=DEM_MODES,
+        default=REPLACE_MODE,
+        help="'replace' the elevation with the DEM one or remove each file's "
+        "'offset' against the DEM",
+    )
+    parser.add_argument(
+        "--bbox",
+        nargs=4,
+        type=float,
+        metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"),
+        help="Keep only the points inside this bounding box",
+    )
+    parser.add_argument(
+        "--polygon",
+        nargs="+",
+        type=float,
+        metavar="LAT LON",
+        help="Keep only the points inside the polygon with these vertices",
+    )
+    parser.add_argument(
+        "--radius",
+        nargs=3,
+        type=float,
+        metavar=("LAT", "LON", "METERS"),
+        help="Keep only the points within METERS of (LAT, LON)",
+    )
+    parser.add_argument(
+        "--clip-invert",
+        action="store_true",
+        help="Drop the points inside --bbox / --polygon / --radius instead",
+    )
+    parser.add_argument(
+        "--overlaps",
+        action="store_true",
+        help="Report which input files cover the same places",
+    )
+    parser.add_argument(
+        "--overlap-tolerance",
+        type=float,
+        default=DEFAULT_OVERLAP_TOLERANCE,
+        metavar="METERS",
+        help="Distance under which points of two files are the same place "
+        "(default: %(default)sm)",
+    )
     parser.add_argument("--debug", action="store_true", help="Log level to DEBUG")
-    return parser.parse_args()
+
+    args = parser.parse_args()
+    args.polygon = polygon_vertices(parser, args.polygon)
+    return args
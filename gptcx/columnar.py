@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from gptcx import Point
+from gptcx import version
+
+
+logger = logging.getLogger(__name__)
+
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather")
+COLUMNAR_SUFFIXES = PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+# Rows per row group (parquet) / record batch (arrow). Each group is built
+# and flushed on its own so writing never holds more than one group of
+# arrow buffers next to the python track points.
+ROW_GROUP_SIZE = 64 * 1024
+
+METADATA_PREFIX = "gptcx"
+CREATOR_KEY = f"{METADATA_PREFIX}:creator"
+TRACK_NAME_KEY = f"{METADATA_PREFIX}:track_name"
+PROVENANCE_KEY = f"{METADATA_PREFIX}:provenance"
+VERSION_KEY = f"{METADATA_PREFIX}:version"
+
+
+def is_columnar(file_path: Text) -> bool:
+    return os.path.splitext(file_path)[1].lower() in COLUMNAR_SUFFIXES
+
+
+def track_schema(metadata: Optional[Dict[Text, Text]] = None) -> pa.Schema:
+    """Arrow schema of a merged track: one row per track point."""
+    return pa.schema(
+        [
+            pa.field("time", pa.timestamp("us", tz="UTC")),
+            pa.field("lat", pa.float64()),
+            pa.field("lon", pa.float64()),
+            pa.field("ele", pa.float64()),
+            pa.field("hr", pa.uint16()),
+            pa.field("source", pa.dictionary(pa.int32(), pa.string())),
+        ],
+        metadata=metadata,
+    )
+
+
+def track_metadata(
+    creator: Text, track_name: Text, provenance: List[Dict[Text, Any]]
+) -> Dict[Text, Text]:
+    return {
+        CREATOR_KEY: creator or "",
+        TRACK_NAME_KEY: track_name or "",
+        PROVENANCE_KEY: json.dumps(provenance, default=_json_default),
+        VERSION_KEY: version.__version__,
+    }
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _record_batch(schema, points: List[Point], source_indices: List[int], sources):
+    lats = [p.pos[0] if p.pos else None for p in points]
+    lons = [p.pos[1] if p.pos else None for p in points]
+
+    return pa.record_batch(
+        [
+            pa.array([p.time for p in points], type=schema.field("time").type),
+            pa.array(lats, type=pa.float64()),
+            pa.array(lons, type=pa.float64()),
+            pa.array([p.ele for p in points], type=pa.float64()),
+            pa.array([p.hr for p in points], type=pa.uint16()),
+            pa.DictionaryArray.from_arrays(
+                pa.array(source_indices, type=pa.int32()), sources
+            ),
+        ],
+        schema=schema,
+    )
+
+
+def write_columnar(
+    output_path: Text,
+    points: List[Point],
+    sources: List[Text],
+    creator: Text = "",
+    track_name: Text = "",
+    provenance: Optional[List[Dict[Text, Any]]] = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+):
+    """Writes merged track points as a columnar (parquet or arrow IPC) file.
+
+    The format is chosen by the output suffix (see `PARQUET_SUFFIXES` and
+    `ARROW_SUFFIXES`).
+
+    Args:
+        output_path (Text): parquet or arrow file to write
+        points (List[Point]): (time sorted) merged track points
+        sources (List[Text]): source file of each track point
+        creator (Text, optional): creator stored in the file metadata
+        track_name (Text, optional): track name stored in the file metadata
+        provenance (List[Dict], optional): per input file merge summary
+        row_group_size (int, optional): rows per row group / record batch
+    """
+    if len(points) != len(sources):
+        raise ValueError(
+            f"Got {len(points)} track points but {len(sources)} sources. "
+            "Expected one source per track point"
+        )
+
+    suffix = os.path.splitext(output_path)[1].lower()
+    if suffix not in COLUMNAR_SUFFIXES:
+        raise ValueError(
+            f"Unknown columnar suffix '{suffix}'. Expected one of {COLUMNAR_SUFFIXES}"
+        )
+
+    schema = track_schema(track_metadata(creator, track_name, provenance or []))
+
+    # A single dictionary shared by all batches (arrow IPC files
+    # don't allow dictionary replacements between batches)
+    source_names = list(dict.fromkeys(sources))
+    source_dictionary = pa.array(source_names, type=pa.string())
+    source_ids = {name: i for i, name in enumerate(source_names)}
+
+    logger.info(f"Writting {len(points)} track points to: {output_path}")
+    if suffix in PARQUET_SUFFIXES:
+        writer = pq.ParquetWriter(output_path, schema)
+    else:
+        writer = pa.ipc.new_file(output_path, schema)
+
+    with writer:
+        for start in range(0, len(points), row_group_size):
+            end = start + row_group_size
+            batch = _record_batch(
+                schema,
+                points[start:end],
+                [source_ids[s] for s in sources[start:end]],
+                source_dictionary,
+            )
+            if suffix in PARQUET_SUFFIXES:
+                writer.write_batch(batch, row_group_size=row_group_size)
+            else:
+                writer.write_batch(batch)
+
+
+def read_columnar(file_path: Text, memory_map: bool = True) -> pa.Table:
+    """Reads a columnar merged track as an arrow Table.
+
+    With `memory_map` the file is mapped instead of read, so arrow IPC files
+    are loaded without copying the column buffers.
+    """
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        return pq.read_table(file_path, memory_map=memory_map)
+
+    if suffix in ARROW_SUFFIXES:
+        source = pa.memory_map(file_path) if memory_map else pa.OSFile(file_path)
+        with source:
+            return pa.ipc.open_file(source).read_all()
+
+    raise ValueError(
+        f"Unknown columnar suffix '{suffix}'. Expected one of {COLUMNAR_SUFFIXES}"
+    )
+
+
+def read_columnar_metadata(file_path: Text) -> Dict[Text, Any]:
+    """Returns the creator, track name and merge provenance of a columnar file."""
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        schema = pq.read_schema(file_path, memory_map=True)
+    else:
+        with pa.memory_map(file_path) as source:
+            schema = pa.ipc.open_file(source).schema
+
+    metadata = schema.metadata or {}
+    metadata = {k.decode(): v.decode() for k, v in metadata.items()}
+
+    return {
+        "creator": metadata.get(CREATOR_KEY, ""),
+        "track_name": metadata.get(TRACK_NAME_KEY, ""),
+        "provenance": json.loads(metadata.get(PROVENANCE_KEY, "[]")),
+        "version": metadata.get(VERSION_KEY, ""),
+    }
@@ -0,0 +1,281 @@
+import logging
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List
+from typing import Optional
+from typing import Text
+
+import numpy as np
+
+from gptcx import Point
+from gptcx.utils import points_to_arrays
+
+
+logger = logging.getLogger(__name__)
+
+
+# SRTM '.hgt' tiles: big-endian int16 samples, 1x1 degree, row 0 at the
+# north edge. The resolution (1 or 3 arc-second) is given by the file size.
+HGT_DTYPE = np.dtype(">i2")
+HGT_VOID = -32768
+HGT_SAMPLES = {
+    3601 * 3601 * HGT_DTYPE.itemsize: 3601,  # SRTM1
+    1201 * 1201 * HGT_DTYPE.itemsize: 1201,  # SRTM3
+}
+
+# Fraction of a sample spacing (~3mm for SRTM1)
+SNAP_TOLERANCE = 1e-6
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+REPLACE_MODE = "replace"
+OFFSET_MODE = "offset"
+DEM_MODES = (REPLACE_MODE, OFFSET_MODE)
+
+
+def hgt_tile_name(lat: int, lon: int) -> Text:
+    """SRTM name of the tile whose south-west corner is (lat, lon): e.g. N45E006.hgt"""
+    lat_prefix = "N" if lat >= 0 else "S"
+    lon_prefix = "E" if lon >= 0 else "W"
+    return f"{lat_prefix}{abs(lat):02d}{lon_prefix}{abs(lon):03d}.hgt"
+
+
+class DEMTileCache:
+    """LRU cache of memory-mapped SRTM tiles read from a local directory.
+
+    Tiles are mapped (not read) so only the pages touched by a lookup are
+    loaded; `max_bytes` bounds the total size of the mapped tiles, evicting the
+    least recently used ones first.
+    """
+
+    def __init__(self, dem_dir: Text, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        if not os.path.isdir(dem_dir):
+            raise ValueError(f"DEM directory not found: {dem_dir}")
+
+        self.dem_dir = dem_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._nbytes = 0
+        self._tiles = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def tile(self, lat: int, lon: int) -> Optional[np.memmap]:
+        """Returns the tile with south-west corner (lat, lon) or None if there
+        is no such tile in the DEM directory (missing tiles are looked up
+        again every time, so tiles added to the directory are picked up)."""
+        key = (lat, lon)
+        if key in self._tiles:
+            self.hits += 1
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        self.misses += 1
+        tile_path = os.path.join(self.dem_dir, hgt_tile_name(lat, lon))
+        if not os.path.exists(tile_path):
+            logger.debug(f"No DEM tile found at: {tile_path}")
+            return None
+
+        file_size = os.path.getsize(tile_path)
+        try:
+            samples = HGT_SAMPLES[file_size]
+        except KeyError:
+            raise ValueError(
+                f"Unexpected size for DEM tile {tile_path}: {file_size} bytes. "
+                f"Expected one of {list(HGT_SAMPLES)}"
+            )
+
+        logger.debug(f"Mapping DEM tile: {tile_path}")
+        tile = np.memmap(tile_path, dtype=HGT_DTYPE, mode="r", shape=(samples, samples))
+        self._tiles[key] = tile
+        self._nbytes += tile.nbytes
+        self._evict()
+
+        return tile
+
+    def _evict(self):
+        # Always keep the most recently used tile, even if bigger than the budget
+        while self._nbytes > self.max_bytes and len(self._tiles) > 1:
+            key, tile = self._tiles.popitem(last=False)
+            self._nbytes -= tile.nbytes
+            logger.debug(f"Evicting DEM tile: {hgt_tile_name(*key)}")
+
+    def lookup(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Bilinear DEM elevation at each (lat, lon). NaN where there is no
+        position, no tile or a void with non-zero weight around the point."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        elevations = np.full(lats.shape, np.nan)
+
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if not len(valid):
+            return elevations
+
+        tile_lats = np.floor(lats[valid]).astype(int)
+        tile_lons = np.floor(lons[valid]).astype(int)
+        self._interpolate(lats, lons, valid, tile_lats, tile_lons, elevations)
+
+        # Points on a tile's south / west edge are also on the north / east
+        # edge of the neighbouring tile: use it when the first one is missing
+        on_lat_edge = lats[valid] == tile_lats
+        on_lon_edge = lons[valid] == tile_lons
+        retry = np.isnan(elevations[valid]) & (on_lat_edge | on_lon_edge)
+        if retry.any():
+            self._interpolate(
+                lats,
+                lons,
+                valid[retry],
+                tile_lats[retry] - on_lat_edge[retry],
+                tile_lons[retry] - on_lon_edge[retry],
+                elevations,
+            )
+
+        missing = np.count_nonzero(np.isnan(elevations[valid]))
+        if missing:
+            logger.warning(f"No DEM elevation for {missing} of {len(valid)} points")
+
+        return elevations
+
+    def _interpolate(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        idx: np.ndarray,
+        tile_lats: np.ndarray,
+        tile_lons: np.ndarray,
+        elevations: np.ndarray,
+    ):
+        """Fills `elevations[idx]` from the tiles with south-west corners
+        (tile_lats, tile_lons), grouping the points so each tile is
+        interpolated in one go."""
+        corners, inverse = np.unique(
+            np.stack([tile_lats, tile_lons], axis=1), axis=0, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(corners) + 1))
+
+        for i, (tile_lat, tile_lon) in enumerate(corners):
+            tile = self.tile(int(tile_lat), int(tile_lon))
+            if tile is None:
+                continue
+
+            in_tile = idx[order[bounds[i] : bounds[i + 1]]]
+            elevations[in_tile] = _bilinear(
+                tile, (tile_lat + 1 - lats[in_tile]), (lons[in_tile] - tile_lon)
+            )
+
+
+def _snap(positions: np.ndarray) -> np.ndarray:
+    """Rounds fractional sample positions within `SNAP_TOLERANCE` of a sample,
+    so floating point noise doesn't give neighbouring samples a tiny weight."""
+    rounded = np.round(positions)
+    return np.where(np.abs(positions - rounded) < SNAP_TOLERANCE, rounded, positions)
+
+
+def _bilinear(tile: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Interpolates a tile at fractional (rows, cols) given in [0, 1] tile units.
+    Voids only make the result NaN when they have a non-zero weight."""
+    last = tile.shape[0] - 1
+    rows = _snap(rows * last)
+    cols = _snap(cols * last)
+
+    r0 = np.clip(np.floor(rows).astype(int), 0, last - 1)
+    c0 = np.clip(np.floor(cols).astype(int), 0, last - 1)
+    dr = rows - r0
+    dc = cols - c0
+
+    elevations = np.zeros(len(rows))
+    for r, c, weight in [
+        (r0, c0, (1 - dr) * (1 - dc)),
+        (r0, c0 + 1, (1 - dr) * dc),
+        (r0 + 1, c0, dr * (1 - dc)),
+        (r0 + 1, c0 + 1, dr * dc),
+    ]:
+        values = tile[r, c].astype(float)
+        values[values == HGT_VOID] = np.nan
+        elevations += np.where(weight > 0, values * weight, 0.0)
+
+    return elevations
+
+
+@lru_cache(maxsize=None)
+def get_tile_cache(dem_dir: Text, max_bytes: int = DEFAULT_CACHE_BYTES) -> DEMTileCache:
+    """Returns a tile cache shared by all the merges using the same DEM directory."""
+    return DEMTileCache(dem_dir, max_bytes=max_bytes)
+
+
+def correct_elevation(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    eles: np.ndarray,
+    cache: DEMTileCache,
+    mode: Text = REPLACE_MODE,
+    sources: Optional[List[Text]] = None,
+) -> np.ndarray:
+    """Corrects track elevations with the DEM.
+
+    Modes:
+        - replace: use the DEM elevation wherever available
+        - offset: keep the recorded elevation but remove each source's median
+          offset against the DEM, so there are no steps when switching between
+          sources. Requires `sources`.
+
+    Points without DEM elevation keep their recorded one (and vice versa).
+    """
+    eles = np.asarray(eles, dtype=float)
+    dem = cache.lookup(lats, lons)
+
+    if mode == REPLACE_MODE:
+        return np.where(np.isfinite(dem), dem, eles)
+
+    if mode == OFFSET_MODE:
+        if sources is None or len(sources) != len(eles):
+            raise ValueError("Elevation 'offset' mode needs a source per track point")
+
+        corrected = eles.copy()
+        sources = np.asarray(sources)
+        for source in np.unique(sources):
+            in_source = sources == source
+            diff = eles[in_source] - dem[in_source]
+            diff = diff[np.isfinite(diff)]
+            if len(diff):
+                offset = np.median(diff)
+                logger.debug(f"Elevation offset for {source}: {offset:.1f}m")
+                corrected[in_source] -= offset
+
+        return np.where(np.isfinite(corrected), corrected, dem)
+
+    raise ValueError(
+        f"Unknown elevation correction mode '{mode}'. Expected {DEM_MODES}"
+    )
+
+
+def correct_track_elevation(
+    points: List[Point],
+    dem_dir: Text,
+    mode: Text = REPLACE_MODE,
+    sources: Optional[List[Text]] = None,
+    max_bytes: int = DEFAULT_CACHE_BYTES,
+) -> List[Point]:
+    """Returns the track points with their elevation corrected from the DEM
+    tiles found in `dem_dir` (see `correct_elevation`)."""
+    cache = get_tile_cache(dem_dir, max_bytes=max_bytes)
+    lats, lons, eles = points_to_arrays(points)
+    corrected = correct_elevation(lats, lons, eles, cache, mode=mode, sources=sources)
+    logger.debug(
+        f"DEM cache: {len(cache)} tiles ({cache.nbytes} bytes), "
+        f"{cache.hits} hits, {cache.misses} misses"
+    )
+
+    return [
+        p._replace(ele=float(ele) if np.isfinite(ele) else None)
+        for p, ele in zip(points, corrected)
+    ]
@@ -1,10 +1,12 @@
 import logging
+import os
 import re
 from tempfile import NamedTemporaryFile
 from time import time
 from typing import Any
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Text
 from typing import Union
 from xml.dom import minidom
@@ -14,32 +16,53 @@ import gpxpy
 import pytz
 
 from gptcx import Point
+from gptcx.snapshot import is_snapshot
+from gptcx.snapshot import Snapshot
+from gptcx.utils import extensions_heart_rate
+from gptcx.utils import heart_rate_extension
 from gptcx.utils import interpolate_zeros
+from gptcx.utils import TRACKPOINT_EXTENSION_NS
+from gptcx.utils import TRACKPOINT_EXTENSION_PREFIX
 
 
 logger = logging.getLogger(__name__)
 
 
 class GPX:
-    def __init__(self, gpx: gpxpy.gpx.GPX) -> None:
+    def __init__(self, gpx: gpxpy.gpx.GPX, source: str = "") -> None:
         self.gpx = gpx
+        # name of the file the track comes from (if any)
+        self.source = source
 
     @classmethod
     def from_file(cls, gpx_path: str):
+        """Read a GPX file (or a binary track snapshot, see `gptcx.snapshot`)."""
+        source = os.path.basename(gpx_path)
+        if is_snapshot(gpx_path):
+            with Snapshot.from_file(gpx_path) as snapshot:
+                return cls(snapshot.to_gpx(), source=source)
+
         try:
             logger.debug(f"Reading gpx: {gpx_path}")
             with open(gpx_path, "r") as f:
-                return cls(gpxpy.parse(f))
+                return cls(gpxpy.parse(f), source=source)
         except Exception as e:
             logger.error(f"Error reading gpx file: {e}")
             raise e
 
     @classmethod
-    def from_track_points(cls, points: List[Union[Point, gpxpy.gpx.GPXTrackPoint]]):
+    def from_track_points(
+        cls,
+        points: List[Union[Point, gpxpy.gpx.GPXTrackPoint]],
+        track_name: Optional[str] = None,
+        creator: Optional[str] = None,
+    ):
         gpx = gpxpy.gpx.GPX()
+        gpx.nsmap[TRACKPOINT_EXTENSION_PREFIX] = TRACKPOINT_EXTENSION_NS
+        gpx.creator = creator or gpx.creator
 
         # Create single track in the new GPX
-        gpx_track = gpxpy.gpx.GPXTrack()
+        gpx_track = gpxpy.gpx.GPXTrack(name=track_name or None)
         gpx.tracks.append(gpx_track)
 
         # Create a single segment in our GPX track
@@ -49,15 +72,15 @@ class GPX:
         # Add all track points
         for p in points:
             if isinstance(p, Point):
-                # TODO: Allow for HR data
-                gpx_segment.points.append(
-                    gpxpy.gpx.GPXTrackPoint(
-                        latitude=p.pos[0],
-                        longitude=p.pos[1],
-                        elevation=p.ele,
-                        time=p.time,
-                    )
+                gpx_trackpoint = gpxpy.gpx.GPXTrackPoint(
+                    latitude=p.pos[0],
+                    longitude=p.pos[1],
+                    elevation=p.ele,
+                    time=p.time,
                 )
+                if p.hr is not None:
+                    gpx_trackpoint.extensions.append(heart_rate_extension(p.hr))
+                gpx_segment.points.append(gpx_trackpoint)
             elif isinstance(p, gpxpy.gpx.GPXTrackPoint):
                 gpx_segment.points.append(p)
 
@@ -90,14 +113,25 @@ class GPX:
                             (point.latitude, point.longitude),
                             point.elevation,
                             point_time,
-                            None,  # TODO: Heart Rate data
+                            extensions_heart_rate(point.extensions),
                         )
                     )
 
         return points
 
     def to_file(self, output_path: str):
-        """Write GPX object to file (XML format)."""
+        """Write GPX object to file (XML format). Output paths with the snapshot
+        or '.tcx' suffix write a binary track snapshot or a TCX file instead."""
+        if is_snapshot(output_path):
+            Snapshot.from_gpx(self.gpx, source=self.source).to_file(output_path)
+            return
+
+        if output_path.endswith(".tcx"):
+            from gptcx.tcx import write_tcx
+
+            write_tcx(output_path, self.track_points)
+            return
+
         logger.info(f"Writting GPX to: {output_path}")
         with open(output_path, "w", encoding="utf8") as f:
             f.write(self.gpx.to_xml())
@@ -294,6 +328,20 @@ def interpolate_zero_hr(track_points: List[minidom.Element]) -> List[minidom.Ele
     return track_points
 
 
+def interpolate_zero_hr_points(track_points: List[Point]) -> List[Point]:
+    """Interpolates the zero heart rate measurements of the given track points
+    (points without heart rate are left untouched)."""
+    hr_indices = [i for i, p in enumerate(track_points) if p.hr is not None]
+    heart_rates = [track_points[i].hr for i in hr_indices]
+    interpolated = interpolate_zeros(heart_rates, missing_value=0)
+
+    track_points = list(track_points)
+    for index, new_hr in zip(hr_indices, interpolated):
+        track_points[index] = track_points[index]._replace(hr=new_hr)
+
+    return track_points
+
+
 def compose_output_gpx(
     gpx_attributes: Dict[Text, Text],
     track_name: Text,
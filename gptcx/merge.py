@@ -1,7 +1,17 @@
 import logging
+import os
+from typing import Any
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
 
 from gptcx import console
+from gptcx import Point
+from gptcx.columnar import is_columnar
+from gptcx.columnar import write_columnar
+from gptcx.dem import correct_track_elevation
+from gptcx.dem import REPLACE_MODE
 from gptcx.gpx import compose_output_gpx
 from gptcx.gpx import get_gpx_attributes
 from gptcx.gpx import get_gpx_creator
@@ -12,47 +22,80 @@ from gptcx.gpx import get_track_point_field
 from gptcx.gpx import get_track_points
 from gptcx.gpx import GPX
 from gptcx.gpx import interpolate_zero_hr
+from gptcx.gpx import interpolate_zero_hr_points
 from gptcx.gpx import read_gpx
 from gptcx.gpx import write_gpx
+from gptcx.snapshot import is_snapshot
+from gptcx.snapshot import Snapshot
+from gptcx.spatial import BBox
+from gptcx.spatial import Circle
+from gptcx.spatial import DEFAULT_OVERLAP_TOLERANCE
+from gptcx.spatial import find_overlaps
+from gptcx.spatial import GridIndex
+from gptcx.spatial import Polygon
 from gptcx.tcx import TCX
+from gptcx.utils import points_to_arrays
 from gptcx.utils import read_xml
 
 
 logger = logging.getLogger(__name__)
 
 
-def merge(gptcx_files: List[str], output_file: str, filter_zeros: bool = False):
-    """Merges GPX and TCX files
+MERGED_CREATOR = "JMRF"
+
+
+def read_track_points(
+    gptcx_files: List[str],
+) -> Tuple[List[Point], List[str], List[Dict[str, Any]], str]:
+    """Reads and time sorts the track points of GPX, TCX and snapshot files
 
     Args:
-        gptcx_files (List[str]): _description_
-        output_file (str): _description_
-        filter_zeros (bool, optional): _description_. Defaults to False.
+        gptcx_files (List[str]): GPX, TCX and snapshot (see `gptcx.snapshot`)
+            files to read
+
+    Returns:
+        Tuple: the sorted track points, the source file of each point, a
+            summary (provenance) of each file and the first track name found
     """
     # # TODO
     # gpx_attributes = {}
     # all_extensions = []
+    track_name = ""
+    provenance = []
     all_track_points = []
+    all_sources = []
 
     for gptcx_file in gptcx_files:
         console.print(f"Reading file: [magenta]{gptcx_file}[/magenta]")
 
-        if gptcx_file.endswith(".gpx"):
-            gpx = GPX.from_file(gptcx_file)
-        elif gptcx_file.endswith(".tcx"):
-            gpx = GPX(TCX.from_file(gptcx_file).to_gpx())
+        source = os.path.basename(gptcx_file)
+        if is_snapshot(gptcx_file):
+            # Snapshots are mapped as they are and keep the source of each point
+            with Snapshot.from_file(gptcx_file) as snapshot:
+                creator, track_names = snapshot.creator, snapshot.tracks
+                track_points = snapshot.track_points
+                point_sources = [s or source for s in snapshot.point_sources]
+        else:
+            if gptcx_file.endswith(".gpx"):
+                gpx = GPX.from_file(gptcx_file)
+            elif gptcx_file.endswith(".tcx"):
+                gpx = GPX(TCX.from_file(gptcx_file).to_gpx(), source=source)
+
+            creator, track_names = gpx.creator, [track.name for track in gpx.tracks]
+            track_points = gpx.track_points
+            point_sources = [source] * len(track_points)
 
         # GPX
-        console.print(f"Creator: [magenta]{gpx.creator}[/magenta]")
+        console.print(f"Creator: [magenta]{creator}[/magenta]")
 
         # # TODO
         # gpx_attributes.update(get_gpx_attributes(doc))
         # logger.debug(f"GPX Attributes: {gpx_attributes}")
 
         # Tracks
-        track_points = []
-        for track in gpx.tracks:
-            console.print(f"Track Name: [magenta]{track.name}[/magenta]")
+        for name in track_names:
+            console.print(f"Track Name: [magenta]{name}[/magenta]")
+            track_name = track_name or name
 
             # # TODO
             # track_extensions = get_track_extensions(track)
@@ -60,34 +103,172 @@ def merge(gptcx_files: List[str], output_file: str, filter_zeros: bool = False):
             # logger.debug(f"Track Extensions: {track_extensions.toprettyxml()}")
 
         # Track Points
-        track_points = gpx.track_points
         logger.debug(f"Found {len(track_points)} track points")
         logger.debug(f"From: {track_points[0].time} to {track_points[-1].time}")
 
-        # Store all the track points and their times
+        # Store all the track points, their source file and where they come from
         all_track_points.extend(track_points)
+        all_sources.extend(point_sources)
+        provenance.append(
+            {
+                "file": source,
+                "creator": creator,
+                "points": len(track_points),
+                "start": track_points[0].time,
+                "end": track_points[-1].time,
+            }
+        )
 
-    # Posprocessing
-    # 1. sort all points based on its time
-    sorted_track_points = sorted(all_track_points, key=lambda x: x.time)
+    # Sort all points (and their sources) based on its time
+    order = sorted(range(len(all_track_points)), key=lambda i: all_track_points[i].time)
+    sorted_track_points = [all_track_points[i] for i in order]
+    sorted_sources = [all_sources[i] for i in order]
 
-    # TODO
-    # # 2. Interpolate zero heart rate measurements
-    # if filter_zeros:
-    #     sorted_track_points = interpolate_zero_hr(sorted_track_points)
+    return sorted_track_points, sorted_sources, provenance, track_name
+
+
+def build_index(points: List[Point], cell_size: Optional[float] = None) -> GridIndex:
+    """Builds a spatial grid index over the given track points"""
+    lats, lons, _ = points_to_arrays(points)
+    return GridIndex(lats, lons, cell_size=cell_size)
 
-    # 3. compose the document
 
-    # # TODO:
-    # gpx_attributes["creator"] = "JMRF"
-    # doc = compose_output_gpx(
-    #     gpx_attributes, track_name, all_extensions, sorted_track_points
-    # )
+def overlaps(
+    gptcx_files: List[str], tolerance: float = DEFAULT_OVERLAP_TOLERANCE
+) -> List[Dict[str, Any]]:
+    """Finds which GPX and TCX files cover the same places
 
-    merged = GPX.from_track_points(sorted_track_points)
+    Args:
+        gptcx_files (List[str]): GPX and TCX files to compare
+        tolerance (float, optional): distance (meters) under which points of two
+            files are considered the same place. Defaults to 25m.
+
+    Returns:
+        List[Dict[str, Any]]: for each pair of overlapping files, the number
+            and fraction of points of each file close to the other one
+    """
+    points, sources, _, _ = read_track_points(gptcx_files)
+    lats, lons, _ = points_to_arrays(points)
+    return find_overlaps(lats, lons, sources, tolerance=tolerance)
+
+
+def print_overlaps(report: List[Dict[str, Any]]):
+    if not report:
+        console.print("No overlapping files found")
+
+    for overlap in report:
+        (file_a, file_b), (points_a, points_b) = overlap["files"], overlap["points"]
+        fraction_a, fraction_b = overlap["fraction"]
+        console.print(
+            f"Overlap: [magenta]{file_a}[/magenta] ({points_a} points, "
+            f"{fraction_a:.0%}) and [magenta]{file_b}[/magenta] ({points_b} "
+            f"points, {fraction_b:.0%})"
+        )
+
+
+def merge(
+    gptcx_files: List[str],
+    output_file: str,
+    filter_zeros: bool = False,
+    dem_dir: Optional[str] = None,
+    dem_mode: str = REPLACE_MODE,
+    bbox: Optional[BBox] = None,
+    polygon: Optional[Polygon] = None,
+    circle: Optional[Circle] = None,
+    clip_invert: bool = False,
+    report_overlaps: bool = False,
+    overlap_tolerance: float = DEFAULT_OVERLAP_TOLERANCE,
+):
+    """Merges GPX and TCX files
+
+    The output format is chosen by the output file suffix: columnar suffixes
+    (see `gptcx.columnar.COLUMNAR_SUFFIXES`) write a parquet / arrow file,
+    `gptcx.snapshot.SNAPSHOT_SUFFIX` a binary track snapshot and anything else
+    a GPX file.
+
+    Args:
+        gptcx_files (List[str]): _description_
+        output_file (str): GPX, parquet, arrow or snapshot output file
+        filter_zeros (bool, optional): interpolate zero heart rate measurements.
+            Defaults to False.
+        dem_dir (str, optional): directory with SRTM '.hgt' tiles used to correct
+            the merged elevation. Defaults to None (no correction).
+        dem_mode (str, optional): elevation correction mode, one of
+            `gptcx.dem.DEM_MODES`. Defaults to 'replace'.
+        bbox (BBox, optional): keep only the points inside this
+            (min_lat, min_lon, max_lat, max_lon) bounding box. Defaults to None.
+        polygon (Polygon, optional): keep only the points inside this
+            [(lat, lon), ...] polygon. Defaults to None.
+        circle (Circle, optional): keep only the points within (lat, lon, meters).
+            Defaults to None.
+        clip_invert (bool, optional): drop the points inside the clipping regions
+            instead of keeping them. Defaults to False.
+        report_overlaps (bool, optional): print which input files cover the same
+            places. Defaults to False.
+        overlap_tolerance (float, optional): distance (meters) under which points
+            of two files are considered the same place. Defaults to 25m.
+    """
+    # 1. read all points sorted by time
+    sorted_track_points, sorted_sources, provenance, track_name = read_track_points(
+        gptcx_files
+    )
+
+    # Posprocessing
+    # 2. Interpolate zero heart rate measurements
+    if filter_zeros:
+        sorted_track_points = interpolate_zero_hr_points(sorted_track_points)
+
+    # 3. Report the input files covering the same places
+    if report_overlaps:
+        lats, lons, _ = points_to_arrays(sorted_track_points)
+        print_overlaps(
+            find_overlaps(lats, lons, sorted_sources, tolerance=overlap_tolerance)
+        )
+
+    # 4. Clip to the region of interest
+    if bbox is not None or polygon is not None or circle is not None:
+        index = build_index(sorted_track_points)
+        keep = index.clip(bbox=bbox, polygon=polygon, circle=circle, invert=clip_invert)
+        console.print(f"Clipping: keeping {len(keep)} of {len(index)} track points")
+        sorted_track_points = [sorted_track_points[i] for i in keep]
+        sorted_sources = [sorted_sources[i] for i in keep]
+
+    # 5. Correct the elevation from the DEM tiles
+    if dem_dir:
+        console.print(f"Correcting elevation ({dem_mode}) with DEM: {dem_dir}")
+        sorted_track_points = correct_track_elevation(
+            sorted_track_points, dem_dir, mode=dem_mode, sources=sorted_sources
+        )
+
+    # 6. Write file: columnar formats and snapshots are written straight from
+    # the track points
+    if is_columnar(output_file):
+        console.print(f"[AFTER] Total {len(sorted_track_points)} track points")
+        write_columnar(
+            output_file,
+            sorted_track_points,
+            sorted_sources,
+            creator=MERGED_CREATOR,
+            track_name=track_name,
+            provenance=provenance,
+        )
+        return
+
+    if is_snapshot(output_file):
+        console.print(f"[AFTER] Total {len(sorted_track_points)} track points")
+        Snapshot.from_track_points(
+            sorted_track_points,
+            sorted_sources,
+            track_name=track_name,
+            creator=MERGED_CREATOR,
+        ).to_file(output_file)
+        return
+
+    merged = GPX.from_track_points(
+        sorted_track_points, track_name=track_name, creator=MERGED_CREATOR
+    )
     console.print(f"[AFTER] Total {len(merged.track_points)} track points")
 
-    # 4. Write file
     merged.to_file(output_file)
 
 
@@ -150,7 +331,7 @@ def xml_merge(gptcx_files: List[str], output_file: str, filter_zeros: bool = Fal
         sorted_track_points = interpolate_zero_hr(sorted_track_points)
 
     # 3. compose the document
-    gpx_attributes["creator"] = "JMRF"
+    gpx_attributes["creator"] = MERGED_CREATOR
     doc = compose_output_gpx(
         gpx_attributes, track_name, all_extensions, sorted_track_points
     )
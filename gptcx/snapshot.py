@@ -0,0 +1,331 @@
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+
+import gpxpy
+import numpy as np
+import pytz
+
+from gptcx import Point
+from gptcx.utils import extensions_heart_rate
+from gptcx.utils import heart_rate_extension
+from gptcx.utils import TRACKPOINT_EXTENSION_NS
+from gptcx.utils import TRACKPOINT_EXTENSION_PREFIX
+
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_SUFFIX = ".gptcx"
+MAGIC = b"GPTCXSNP"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Fixed-width (little-endian) columns, in file order. Missing values are NaT
+# (time) and NaN (lat, lon, ele); heart rate validity is kept in a bitmap.
+COLUMNS = (
+    ("time", np.dtype("<M8[ns]")),
+    ("lat", np.dtype("<f8")),
+    ("lon", np.dtype("<f8")),
+    ("ele", np.dtype("<f8")),
+    ("hr", np.dtype("<u2")),
+    ("source", np.dtype("<u4")),  # index in the source files table
+    ("track", np.dtype("<u4")),  # index in the track names table
+)
+
+# magic, version, flags, n_points, n_sources, n_tracks, the offset of each
+# column, of the heart rate validity bitmap and of the string tables
+HEADER = struct.Struct("<8sHHQII" + "Q" * (len(COLUMNS) + 2))
+STRING_LENGTH = struct.Struct("<I")
+
+
+def is_snapshot(file_path: Text) -> bool:
+    return os.path.splitext(file_path)[1].lower() == SNAPSHOT_SUFFIX
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _utc(time: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC datetime (as numpy expects it)"""
+    if time is not None and time.tzinfo is not None:
+        return time.astimezone(pytz.UTC).replace(tzinfo=None)
+    return time
+
+
+class Snapshot:
+    """Binary snapshot of track data.
+
+    Layout (version 1): a fixed header, one aligned fixed-width array per
+    column (see `COLUMNS`), the heart rate validity bitmap and the string
+    tables (creator, source files and track names; each as a u32 length and
+    utf-8 bytes). Snapshots read with `from_file` are memory-mapped and their
+    columns are read-only views over the file, i.e. loading copies nothing.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[Text, np.ndarray],
+        hr_bitmap: np.ndarray,
+        sources: List[Text],
+        tracks: List[Text],
+        creator: Text = "",
+        buffer: Optional[mmap.mmap] = None,
+    ) -> None:
+        self.columns = columns
+        self.hr_bitmap = hr_bitmap
+        self.sources = sources
+        self.tracks = tracks
+        self.creator = creator
+        # keeps the mapping alive as long as the column views
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmaps the snapshot file. Its columns can't be used afterwards."""
+        if self._buffer is None:
+            return
+
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        self.hr_bitmap = np.empty(0, dtype=np.uint8)
+        try:
+            self._buffer.close()
+        except BufferError:
+            logger.warning(
+                "Snapshot columns are still referenced elsewhere: the file stays "
+                "mapped until they are released"
+            )
+        self._buffer = None
+
+    @property
+    def hr_valid(self) -> np.ndarray:
+        valid = np.unpackbits(self.hr_bitmap, count=len(self), bitorder="little")
+        return valid.astype(bool)
+
+    @classmethod
+    def from_columns(
+        cls,
+        times: List[Optional[datetime]],
+        lats: List[Optional[float]],
+        lons: List[Optional[float]],
+        eles: List[Optional[float]],
+        hrs: List[Optional[int]],
+        source_ids: List[int],
+        track_ids: List[int],
+        sources: List[Text],
+        tracks: List[Text],
+        creator: Text = "",
+    ):
+        hr_valid = np.array([hr is not None for hr in hrs], dtype=bool)
+        columns = {
+            "time": np.array([_utc(t) for t in times], dtype="datetime64[ns]"),
+            "lat": np.array(lats, dtype=float),
+            "lon": np.array(lons, dtype=float),
+            "ele": np.array(eles, dtype=float),
+            "hr": np.array([hr or 0 for hr in hrs], dtype=np.uint16),
+            "source": np.array(source_ids, dtype=np.uint32),
+            "track": np.array(track_ids, dtype=np.uint32),
+        }
+        columns = {name: columns[name].astype(dtype) for name, dtype in COLUMNS}
+        hr_bitmap = np.packbits(hr_valid, bitorder="little")
+
+        return cls(columns, hr_bitmap, list(sources), list(tracks), creator)
+
+    @classmethod
+    def from_track_points(
+        cls,
+        points: List[Point],
+        sources: List[Text],
+        track_name: Text = "",
+        creator: Text = "",
+    ):
+        """Snapshot of (merged) track points: a single track, with the source
+        file of each point."""
+        source_names = list(dict.fromkeys(sources))
+        source_ids = {name: i for i, name in enumerate(source_names)}
+
+        return cls.from_columns(
+            [p.time for p in points],
+            [p.pos[0] if p.pos else None for p in points],
+            [p.pos[1] if p.pos else None for p in points],
+            [p.ele for p in points],
+            [p.hr for p in points],
+            [source_ids[s] for s in sources],
+            [0] * len(points),
+            source_names,
+            [track_name or ""],
+            creator,
+        )
+
+    @classmethod
+    def from_gpx(cls, gpx: gpxpy.gpx.GPX, source: Text = ""):
+        """Snapshot of a gpxpy GPX (the segments of each track are joined)."""
+        times, lats, lons, eles, hrs, track_ids = [], [], [], [], [], []
+        for track_id, track in enumerate(gpx.tracks):
+            for segment in track.segments:
+                for point in segment.points:
+                    times.append(point.time)
+                    lats.append(point.latitude)
+                    lons.append(point.longitude)
+                    eles.append(point.elevation)
+                    hrs.append(extensions_heart_rate(point.extensions))
+                    track_ids.append(track_id)
+
+        return cls.from_columns(
+            times,
+            lats,
+            lons,
+            eles,
+            hrs,
+            [0] * len(times),
+            track_ids,
+            [source],
+            [track.name or "" for track in gpx.tracks],
+            gpx.creator or "",
+        )
+
+    @classmethod
+    def from_file(cls, snapshot_path: Text):
+        """Memory-maps a snapshot file (see `close`, or use it as a context
+        manager, to unmap it)."""
+        logger.debug(f"Mapping snapshot: {snapshot_path}")
+        with open(snapshot_path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if len(buffer) < HEADER.size or buffer[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"Not a track snapshot file: {snapshot_path}")
+
+            magic, version, flags, n_points, n_sources, n_tracks, *offsets = (
+                HEADER.unpack_from(buffer, 0)
+            )
+            if version > FORMAT_VERSION:
+                raise ValueError(
+                    f"Snapshot {snapshot_path} has format version {version}. "
+                    f"Expected version <= {FORMAT_VERSION}"
+                )
+        except Exception:
+            buffer.close()
+            raise
+
+        columns = {
+            name: np.frombuffer(buffer, dtype=dtype, count=n_points, offset=offset)
+            for (name, dtype), offset in zip(COLUMNS, offsets)
+        }
+        hr_bitmap = np.frombuffer(
+            buffer, dtype=np.uint8, count=-(-n_points // 8), offset=offsets[-2]
+        )
+
+        strings = []
+        offset = offsets[-1]
+        for _ in range(1 + n_sources + n_tracks):
+            (length,) = STRING_LENGTH.unpack_from(buffer, offset)
+            offset += STRING_LENGTH.size
+            strings.append(buffer[offset : offset + length].decode("utf8"))
+            offset += length
+
+        creator = strings[0]
+        sources = strings[1 : 1 + n_sources]
+        tracks = strings[1 + n_sources :]
+
+        return cls(columns, hr_bitmap, sources, tracks, creator, buffer=buffer)
+
+    def to_file(self, output_path: Text):
+        """Write the snapshot to file (binary format)."""
+        logger.info(f"Writting snapshot to: {output_path}")
+
+        offsets = []
+        offset = _align(HEADER.size)
+        for name, _ in COLUMNS:
+            offsets.append(offset)
+            offset = _align(offset + self.columns[name].nbytes)
+        offsets.append(offset)  # heart rate validity bitmap
+        offsets.append(_align(offset + self.hr_bitmap.nbytes))  # string tables
+
+        header = HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            0,
+            len(self),
+            len(self.sources),
+            len(self.tracks),
+            *offsets,
+        )
+
+        arrays = [self.columns[name] for name, _ in COLUMNS] + [self.hr_bitmap]
+        with open(output_path, "wb") as f:
+            f.write(header)
+            for offset, array in zip(offsets, arrays):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(array.tobytes())
+
+            f.write(b"\0" * (offsets[-1] - f.tell()))
+            for string in [self.creator] + self.sources + self.tracks:
+                encoded = string.encode("utf8")
+                f.write(STRING_LENGTH.pack(len(encoded)))
+                f.write(encoded)
+
+    @property
+    def track_points(self) -> List[Point]:
+        times = [
+            t.replace(tzinfo=pytz.UTC) if t is not None else None
+            for t in self.columns["time"].astype("datetime64[us]").tolist()
+        ]
+        lats, lons, eles = (
+            [v if np.isfinite(v) else None for v in self.columns[name].tolist()]
+            for name in ("lat", "lon", "ele")
+        )
+        hrs = [
+            hr if valid else None
+            for hr, valid in zip(self.columns["hr"].tolist(), self.hr_valid)
+        ]
+
+        return [
+            Point((lat, lon), ele, t, hr)
+            for t, lat, lon, ele, hr in zip(times, lats, lons, eles, hrs)
+        ]
+
+    @property
+    def point_sources(self) -> List[Text]:
+        return [self.sources[i] for i in self.columns["source"].tolist()]
+
+    def to_gpx(self) -> gpxpy.gpx.GPX:
+        """Create gpxpy GPX object (heart rates as Garmin track point extensions)."""
+        gpx = gpxpy.gpx.GPX()
+        gpx.creator = self.creator or gpx.creator
+        gpx.nsmap[TRACKPOINT_EXTENSION_PREFIX] = TRACKPOINT_EXTENSION_NS
+
+        segments = []
+        for track_name in self.tracks:
+            gpx_track = gpxpy.gpx.GPXTrack(name=track_name or None)
+            gpx.tracks.append(gpx_track)
+            segments.append(gpxpy.gpx.GPXTrackSegment())
+            gpx_track.segments.append(segments[-1])
+
+        for p, track_id in zip(self.track_points, self.columns["track"].tolist()):
+            gpx_trackpoint = gpxpy.gpx.GPXTrackPoint(
+                latitude=p.pos[0] if p.pos else None,
+                longitude=p.pos[1] if p.pos else None,
+                elevation=p.ele,
+                time=p.time,
+            )
+            if p.hr is not None:
+                gpx_trackpoint.extensions.append(heart_rate_extension(p.hr))
+            segments[track_id].points.append(gpx_trackpoint)
+
+        return gpx
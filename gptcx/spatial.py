@@ -0,0 +1,318 @@
+import logging
+from itertools import combinations
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Text
+from typing import Tuple
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+EARTH_RADIUS = 6371008.8  # meters (mean radius)
+
+# Average number of points per (non empty) cell when the cell size is not given
+POINTS_PER_CELL = 16
+MIN_CELL_SIZE = 1e-5  # degrees (~1m)
+
+# Overlaps are found on a fixed grid of cells of this size (meters)
+DEFAULT_OVERLAP_TOLERANCE = 25.0
+MIN_OVERLAP_TOLERANCE = 1.0
+MIN_COS_LAT = 0.01  # caps the longitude cell count near the poles
+CELL_KEY_ROW = 2**32
+CELL_KEY_OFFSET = 2**30
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lon, max_lat, max_lon)
+Polygon = Sequence[Tuple[float, float]]  # [(lat, lon), ...]
+Circle = Tuple[float, float, float]  # (lat, lon, radius in meters)
+
+
+def haversine(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distance in meters from (lat, lon) to each of (lats, lons)."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def points_in_polygon(
+    lats: np.ndarray, lons: np.ndarray, polygon: Polygon
+) -> np.ndarray:
+    """Even-odd (ray casting) test of each point against the polygon."""
+    inside = np.zeros(len(lats), dtype=bool)
+    vertices = np.asarray(polygon, dtype=float)
+    for (lat_a, lon_a), (lat_b, lon_b) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        crosses = (lats < lat_a) != (lats < lat_b)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_cross = lon_a + (lats - lat_a) * (lon_b - lon_a) / (lat_b - lat_a)
+        inside ^= crosses & (lons < lon_cross)
+
+    return inside
+
+
+class GridIndex:
+    """Uniform lat / lon grid over track points.
+
+    Point indices are sorted by cell (and by index within each cell) so the
+    points of a row of cells are a contiguous slice found by binary search:
+    region queries only visit the cells overlapping the region instead of
+    every point. Indices returned by the queries are sorted, i.e. they keep the
+    (time) order of the indexed points.
+    """
+
+    def __init__(
+        self, lats: np.ndarray, lons: np.ndarray, cell_size: Optional[float] = None
+    ) -> None:
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        if self.lats.shape != self.lons.shape:
+            raise ValueError(
+                f"Got {len(self.lats)} latitudes but {len(self.lons)} longitudes"
+            )
+
+        valid = np.flatnonzero(np.isfinite(self.lats) & np.isfinite(self.lons))
+        if len(valid):
+            self.min_lat = self.lats[valid].min()
+            self.min_lon = self.lons[valid].min()
+            lat_span = self.lats[valid].max() - self.min_lat
+            lon_span = self.lons[valid].max() - self.min_lon
+        else:
+            self.min_lat = self.min_lon = lat_span = lon_span = 0.0
+
+        if cell_size is None:
+            n_cells = max(len(valid) / POINTS_PER_CELL, 1)
+            cell_size = np.sqrt(
+                max(lat_span, MIN_CELL_SIZE) * max(lon_span, MIN_CELL_SIZE) / n_cells
+            )
+        self.cell_size = max(float(cell_size), MIN_CELL_SIZE)
+
+        self.n_rows = int(lat_span // self.cell_size) + 1
+        self.n_cols = int(lon_span // self.cell_size) + 1
+
+        # Cell of every point (-1 for points without position)
+        self.point_cells = np.full(len(self.lats), -1, dtype=np.int64)
+        rows = self._row(self.lats[valid])
+        cols = self._col(self.lons[valid])
+        self.point_cells[valid] = rows * self.n_cols + cols
+
+        order = np.argsort(self.point_cells[valid], kind="stable")
+        self._order = valid[order]
+        self._cells = self.point_cells[self._order]
+
+        logger.debug(
+            f"Indexed {len(valid)} points in a {self.n_rows}x{self.n_cols} grid "
+            f"(cell size: {self.cell_size:.6f} degrees)"
+        )
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _row(self, lats: np.ndarray) -> np.ndarray:
+        rows = np.floor((lats - self.min_lat) / self.cell_size).astype(np.int64)
+        return np.clip(rows, 0, self.n_rows - 1)
+
+    def _col(self, lons: np.ndarray) -> np.ndarray:
+        cols = np.floor((lons - self.min_lon) / self.cell_size).astype(np.int64)
+        return np.clip(cols, 0, self.n_cols - 1)
+
+    def candidates(self, bbox: BBox) -> np.ndarray:
+        """Indices of the points in the cells overlapping the bounding box (a
+        superset of the points inside it)."""
+        min_lat, min_lon, max_lat, max_lon = bbox
+        max_lat_grid = self.min_lat + self.n_rows * self.cell_size
+        max_lon_grid = self.min_lon + self.n_cols * self.cell_size
+        if (
+            max_lat < self.min_lat
+            or max_lon < self.min_lon
+            or min_lat > max_lat_grid
+            or min_lon > max_lon_grid
+        ):
+            return np.empty(0, dtype=np.int64)
+
+        row_0, row_1 = self._row(np.array([min_lat, max_lat]))
+        col_0, col_1 = self._col(np.array([min_lon, max_lon]))
+
+        # Within a row, the cells [col_0, col_1] are a contiguous slice
+        rows = np.arange(row_0, row_1 + 1)
+        starts = np.searchsorted(self._cells, rows * self.n_cols + col_0, "left")
+        ends = np.searchsorted(self._cells, rows * self.n_cols + col_1, "right")
+        slices = [self._order[s:e] for s, e in zip(starts, ends) if e > s]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+
+        return np.concatenate(slices)
+
+    def bbox(self, bbox: BBox) -> np.ndarray:
+        """Sorted indices of the points inside the bounding box."""
+        min_lat, min_lon, max_lat, max_lon = bbox
+        idx = self.candidates(bbox)
+        lats, lons = self.lats[idx], self.lons[idx]
+        inside = (
+            (lats >= min_lat)
+            & (lats <= max_lat)
+            & (lons >= min_lon)
+            & (lons <= max_lon)
+        )
+        return np.sort(idx[inside])
+
+    def polygon(self, polygon: Polygon) -> np.ndarray:
+        """Sorted indices of the points inside the polygon [(lat, lon), ...]."""
+        vertices = np.asarray(polygon, dtype=float)
+        if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+            raise ValueError(
+                f"Expected a polygon of at least 3 (lat, lon) vertices. Got: {polygon}"
+            )
+
+        min_lat, min_lon = vertices.min(axis=0)
+        max_lat, max_lon = vertices.max(axis=0)
+        idx = self.candidates((min_lat, min_lon, max_lat, max_lon))
+        inside = points_in_polygon(self.lats[idx], self.lons[idx], vertices)
+        return np.sort(idx[inside])
+
+    def radius(self, lat: float, lon: float, meters: float) -> np.ndarray:
+        """Sorted indices of the points within `meters` of (lat, lon)."""
+        dlat = np.degrees(meters / EARTH_RADIUS)
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        idx = self.candidates((lat - dlat, lon - dlon, lat + dlat, lon + dlon))
+        inside = haversine(lat, lon, self.lats[idx], self.lons[idx]) <= meters
+        return np.sort(idx[inside])
+
+    def clip(
+        self,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[Polygon] = None,
+        circle: Optional[Circle] = None,
+        invert: bool = False,
+    ) -> np.ndarray:
+        """Sorted indices of the points inside all the given regions (or outside
+        them, with `invert`)."""
+        selected = None
+        for region, query in [
+            (bbox, self.bbox),
+            (polygon, self.polygon),
+            (circle, lambda c: self.radius(*c)),
+        ]:
+            if region is None:
+                continue
+            idx = query(region)
+            selected = idx if selected is None else np.intersect1d(selected, idx)
+
+        if selected is None:
+            selected = np.arange(len(self))
+
+        if invert:
+            return np.setdiff1d(np.arange(len(self)), selected)
+
+        return selected
+
+
+def _overlap_cells(
+    lats: np.ndarray, lons: np.ndarray, tolerance: float, row_offset: int = 0
+) -> np.ndarray:
+    """Cell key of each point in a fixed grid of ~`tolerance` meters cells (or,
+    with `row_offset`, of the cell at the point's longitude that many rows
+    away).
+
+    The grid only depends on the tolerance (not on the points), so the same
+    files always fall in the same cells. Longitude steps are scaled by the
+    cosine of each cell row's latitude, so columns don't line up between rows:
+    neighbours in other rows must be found from the longitude, not by adding
+    to the column.
+    """
+    lat_step = np.degrees(tolerance / EARTH_RADIUS)
+    rows = np.floor(lats / lat_step).astype(np.int64) + row_offset
+    row_lats = (rows + 0.5) * lat_step
+    lon_steps = lat_step / np.maximum(np.cos(np.radians(row_lats)), MIN_COS_LAT)
+    cols = np.floor(lons / lon_steps).astype(np.int64)
+
+    return (rows + CELL_KEY_OFFSET) * CELL_KEY_ROW + (cols + CELL_KEY_OFFSET)
+
+
+def find_overlaps(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    sources: Sequence[Text],
+    tolerance: float = DEFAULT_OVERLAP_TOLERANCE,
+) -> List[Dict[Text, Any]]:
+    """Reports, for each pair of sources, how many of their points are within
+    about `tolerance` meters of a point of the other source.
+
+    Points are bucketed in a grid of `tolerance` sized cells and a point
+    overlaps when the other source has points in its cell or in one of the 8
+    cells around it (found at its longitude in the rows above and below).
+    Points are counted per (source, cell) once; each pair of sources is then
+    compared on their cells only.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if len(sources) != len(lats) or len(lons) != len(lats):
+        raise ValueError(
+            f"Got {len(lats)} latitudes, {len(lons)} longitudes and {len(sources)} "
+            "sources. Expected one of each per point"
+        )
+    if tolerance < MIN_OVERLAP_TOLERANCE:
+        raise ValueError(
+            f"Overlap tolerance must be at least {MIN_OVERLAP_TOLERANCE}m. "
+            f"Got: {tolerance}"
+        )
+
+    names, codes = np.unique(np.asarray(sources), return_inverse=True)
+    codes = codes.reshape(-1)
+    totals = np.bincount(codes, minlength=len(names))
+
+    valid = np.isfinite(lats) & np.isfinite(lons)
+    keys = _overlap_cells(lats[valid], lons[valid], tolerance)
+    codes = codes[valid]
+
+    # Points per (source, cell), in a single sort
+    order = np.lexsort((keys, codes))
+    pairs = np.stack([codes[order], keys[order]])
+    (pair_codes, pair_keys), counts = np.unique(pairs, axis=1, return_counts=True)
+    bounds = np.searchsorted(pair_codes, np.arange(len(names) + 1))
+    source_cells = [pair_keys[bounds[i] : bounds[i + 1]] for i in range(len(names))]
+    source_counts = [counts[bounds[i] : bounds[i + 1]] for i in range(len(names))]
+
+    # Cells around each point: within a row the columns are contiguous, but
+    # the rows above and below need their own column for the point's longitude
+    lats, lons = lats[valid][order], lons[valid][order]
+    near = np.stack(
+        [
+            _overlap_cells(lats, lons, tolerance, row_offset=dr) + dc
+            for dr in (-1, 0, 1)
+            for dc in (-1, 0, 1)
+        ]
+    )
+    point_bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    source_near = [
+        np.unique(near[:, point_bounds[i] : point_bounds[i + 1]])
+        for i in range(len(names))
+    ]
+
+    report = []
+    for a, b in combinations(range(len(names)), 2):
+        near_b = np.isin(source_cells[a], source_near[b], assume_unique=True)
+        near_a = np.isin(source_cells[b], source_near[a], assume_unique=True)
+        if not near_b.any():
+            continue
+
+        points = (
+            int(source_counts[a][near_b].sum()),
+            int(source_counts[b][near_a].sum()),
+        )
+        report.append(
+            {
+                "files": (str(names[a]), str(names[b])),
+                "points": points,
+                "fraction": (points[0] / totals[a], points[1] / totals[b]),
+            }
+        )
+
+    return report
@@ -2,21 +2,35 @@ import logging
 from datetime import datetime
 from itertools import zip_longest
 from typing import List
+from xml.dom import minidom
+from xml.etree import ElementTree
 
 import coloredlogs
 import dateutil.parser
 import gpxpy
+import numpy as np
 import pytz
 from tcxparser import TCXParser
 
 from gptcx import Point
 from gptcx.gpx import GPX
+from gptcx.spatial import haversine
+from gptcx.utils import heart_rate_extension
+from gptcx.utils import points_to_arrays
+from gptcx.utils import TRACKPOINT_EXTENSION_NS
+from gptcx.utils import TRACKPOINT_EXTENSION_PREFIX
 
 
 logger = logging.getLogger(__name__)
 coloredlogs.install(logger=logger, level=logging.DEBUG)
 
 
+TCX_NS = "http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"
+TCX_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+TCX_SPORTS = ("Running", "Biking", "Other")
+TCX_DEFAULT_SPORT = "Other"
+
+
 class TCX:
     def __init__(self, tcx: TCXParser = None) -> None:
         self.tcx = tcx
@@ -60,10 +74,9 @@ class TCX:
     def to_gpx(self, gpx_name: str = "", description: str = "") -> GPX:
         """Create GPX object."""
 
-        # TODO: Add gpx extensions so we can add heart rate data
-
         logger.debug(f"Creating GPX from TCX")
         _gpx = gpxpy.gpx.GPX()
+        _gpx.nsmap[TRACKPOINT_EXTENSION_PREFIX] = TRACKPOINT_EXTENSION_NS
         _gpx.name = gpx_name
         _gpx.description = description
 
@@ -87,16 +100,85 @@ class TCX:
                 elevation=alt,
                 time=t,
             )
+            if hr is not None:
+                gpx_trackpoint.extensions.append(heart_rate_extension(hr))
             gpx_segment.points.append(gpx_trackpoint)
 
         return _gpx
 
     def to_file(self, output_path: str):
-        raise NotImplementedError("TCX.to_file not implemented yet!")
+        """Write TCX object to file (XML format)."""
+        sport = (self.tcx.activity_type or "").capitalize()
+        write_tcx(output_path, self.track_points, sport=sport)
+
+
+def write_tcx(output_path: str, points: List[Point], sport: str = TCX_DEFAULT_SPORT):
+    """Writes track points as a single lap TCX activity.
+
+    Points without time are skipped (TCX requires it). Distances are the
+    cumulative great-circle distances between the positions.
+    """
+    if sport not in TCX_SPORTS:
+        sport = TCX_DEFAULT_SPORT
+
+    timed_points = [p for p in points if p.time is not None]
+    if len(timed_points) < len(points):
+        logger.warning(
+            f"Skipping {len(points) - len(timed_points)} points without time"
+        )
+    if not timed_points:
+        raise ValueError("Can't write a TCX activity without timed track points")
+
+    lats, lons, _ = points_to_arrays(timed_points)
+    steps = haversine(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    distances = np.concatenate([[0.0], np.cumsum(np.nan_to_num(steps))])
+
+    def element(parent, tag, text=None, **attributes):
+        elem = ElementTree.SubElement(parent, tag, attributes)
+        if text is not None:
+            elem.text = str(text)
+        return elem
+
+    def utc_time(time: datetime) -> str:
+        if time.tzinfo is not None:
+            time = time.astimezone(pytz.UTC)
+        return time.strftime(TCX_TIME_FORMAT)
+
+    start = utc_time(timed_points[0].time)
+    root = ElementTree.Element("TrainingCenterDatabase", xmlns=TCX_NS)
+    activity = element(element(root, "Activities"), "Activity", Sport=sport)
+    element(activity, "Id", start)
+    lap = element(activity, "Lap", StartTime=start)
+    duration = timed_points[-1].time - timed_points[0].time
+    element(lap, "TotalTimeSeconds", duration.total_seconds())
+    element(lap, "DistanceMeters", distances[-1])
+    element(lap, "Calories", 0)
+    element(lap, "Intensity", "Active")
+    element(lap, "TriggerMethod", "Manual")
+    track = element(lap, "Track")
+
+    for p, distance in zip(timed_points, distances):
+        trackpoint = element(track, "Trackpoint")
+        element(trackpoint, "Time", utc_time(p.time))
+        if p.pos and p.pos[0] is not None and p.pos[1] is not None:
+            position = element(trackpoint, "Position")
+            element(position, "LatitudeDegrees", p.pos[0])
+            element(position, "LongitudeDegrees", p.pos[1])
+        if p.ele is not None:
+            element(trackpoint, "AltitudeMeters", p.ele)
+        element(trackpoint, "DistanceMeters", distance)
+        if p.hr is not None:
+            element(element(trackpoint, "HeartRateBpm"), "Value", int(round(p.hr)))
+
+    logger.info(f"Writting TCX to: {output_path}")
+    xml_str = minidom.parseString(ElementTree.tostring(root)).toprettyxml(indent="  ")
+    with open(output_path, "w", encoding="utf8") as f:
+        f.write(xml_str)
 
 
 if __name__ == "__main__":
+    import os
     import sys
 
     tcx = TCX.from_file(sys.argv[1])
-    GPX(tcx.to_gpx()).to_file(sys.argv[2])
+    GPX(tcx.to_gpx(), source=os.path.basename(sys.argv[1])).to_file(sys.argv[2])
@@ -1,9 +1,18 @@
 from typing import List
+from typing import Optional
+from typing import Tuple
 from xml.dom import minidom
+from xml.etree import ElementTree
 
 import numpy as np
 import pandas as pd
 
+from gptcx import Point
+
+
+TRACKPOINT_EXTENSION_PREFIX = "gpxtpx"
+TRACKPOINT_EXTENSION_NS = "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
+
 
 def read_xml(gptcx_file: str) -> minidom.Document:
     try:
@@ -15,7 +24,44 @@ def read_xml(gptcx_file: str) -> minidom.Document:
 
 def interpolate_zeros(values: List[int], missing_value: int = 0) -> List[int]:
     _values = [v if v != missing_value else np.nan for v in values]
-    s = pd.Series(_values)
-    interpolated = list(map(int, s.interpolate().to_list()))
+    s = pd.Series(_values, dtype=float)
+    if s.isna().all():
+        return list(values)
+
+    # leading / trailing missing values take the closest measurement
+    interpolated = list(map(int, s.interpolate(limit_direction="both").to_list()))
 
     return interpolated
+
+
+def points_to_arrays(points: List[Point]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the latitudes, longitudes and elevations of the given track points
+    as float arrays (missing values become NaN)."""
+    lats = np.array([p.pos[0] if p.pos else None for p in points], dtype=float)
+    lons = np.array([p.pos[1] if p.pos else None for p in points], dtype=float)
+    eles = np.array([p.ele for p in points], dtype=float)
+
+    return lats, lons, eles
+
+
+def extensions_heart_rate(extensions: List[ElementTree.Element]) -> Optional[int]:
+    """Returns the heart rate (e.g. 'gpxtpx:hr') found in a track point
+    extensions or None if there isn't any."""
+    for extension in extensions:
+        for elem in extension.iter():
+            tag = elem.tag.rsplit("}", 1)[-1].rsplit(":", 1)[-1]
+            if tag == "hr" and elem.text:
+                try:
+                    return int(float(elem.text))
+                except ValueError:
+                    return None
+
+    return None
+
+
+def heart_rate_extension(hr: int) -> ElementTree.Element:
+    """Creates a Garmin 'TrackPointExtension' holding the given heart rate."""
+    extension = ElementTree.Element(f"{{{TRACKPOINT_EXTENSION_NS}}}TrackPointExtension")
+    ElementTree.SubElement(extension, f"{{{TRACKPOINT_EXTENSION_NS}}}hr").text = str(hr)
+
+    return extension
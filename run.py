@@ -6,7 +6,11 @@ from typing import Text
 
 from gptcx import configure_colored_logging
 from gptcx.cli import get_args
-from gptcx.merge import xml_merge as merge
+from gptcx.columnar import is_columnar
+from gptcx.merge import merge
+from gptcx.merge import xml_merge
+from gptcx.snapshot import is_snapshot
+from gptcx.snapshot import SNAPSHOT_SUFFIX
 
 
 logger = logging.getLogger(__name__)
@@ -20,15 +24,46 @@ def find_files(gpx_dir: Text, extensions: List[str]):
     return found
 
 
+def needs_track_points(args, gptcx_files: List[str]) -> bool:
+    return (
+        is_columnar(args.output_file)
+        or is_snapshot(args.output_file)
+        or any(is_snapshot(f) for f in gptcx_files)
+        or args.dem_dir is not None
+        or args.bbox is not None
+        or args.polygon is not None
+        or args.radius is not None
+        or args.overlaps
+    )
+
+
 def main():
     args = get_args()
     # logging
     log_level = logging.DEBUG if args.debug else logging.INFO
     configure_colored_logging(level=log_level)
     # gather
-    gptcx_files = find_files(args.input_dir, extensions=["gpx", "tcx"])
-    # merge
-    merge(gptcx_files, args.output_file, args.filter_zeros)
+    gptcx_files = find_files(
+        args.input_dir, extensions=["gpx", "tcx", SNAPSHOT_SUFFIX.lstrip(".")]
+    )
+    # merge: snapshots, columnar outputs, DEM corrections and spatial queries
+    # work on the parsed track points
+    if needs_track_points(args, gptcx_files):
+        merge(
+            gptcx_files,
+            args.output_file,
+            args.filter_zeros,
+            dem_dir=args.dem_dir,
+            dem_mode=args.dem_mode,
+            bbox=args.bbox,
+            polygon=args.polygon,
+            circle=args.radius,
+            clip_invert=args.clip_invert,
+            report_overlaps=args.overlaps,
+            overlap_tolerance=args.overlap_tolerance,
+        )
+    else:
+        xml_merge(gptcx_files, args.output_file, args.filter_zeros)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+import pytz
+
+from gptcx import Point
+
+
+@pytest.fixture
+def start():
+    return datetime(2022, 4, 28, 10, 0, tzinfo=pytz.UTC)
+
+
+@pytest.fixture
+def make_points(start):
+    """Factory of `n` one second apart track points, with some elevations and
+    heart rates missing."""
+
+    def _make_points(n):
+        return [
+            Point(
+                (40.4 + i * 1e-4, -3.7 + i * 1e-4),
+                650.0 + i if i % 3 else None,
+                start + timedelta(seconds=i),
+                120 + i if i % 2 else None,
+            )
+            for i in range(n)
+        ]
+
+    return _make_points
@@ -0,0 +1,73 @@
+import pytest
+
+from gptcx import Point
+from gptcx.columnar import is_columnar
+from gptcx.columnar import read_columnar
+from gptcx.columnar import read_columnar_metadata
+from gptcx.columnar import write_columnar
+from gptcx.gpx import interpolate_zero_hr_points
+
+
+def test_is_columnar():
+    assert is_columnar("merged.parquet")
+    assert is_columnar("merged.ARROW")
+    assert not is_columnar("merged.gpx")
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_write_read_columnar(tmp_path, suffix, start, make_points):
+    points = make_points(25)
+    sources = ["watch.gpx"] * 10 + ["phone.tcx"] * 15
+    provenance = [{"file": "watch.gpx", "points": 10, "start": start}]
+    output = str(tmp_path / f"merged{suffix}")
+
+    write_columnar(
+        output,
+        points,
+        sources,
+        creator="JMRF",
+        track_name="Morning run",
+        provenance=provenance,
+        row_group_size=7,
+    )
+
+    table = read_columnar(output)
+    assert table.num_rows == len(points)
+    assert table.column("time").to_pylist() == [p.time for p in points]
+    assert table.column("lat").to_pylist() == [p.pos[0] for p in points]
+    assert table.column("ele").to_pylist() == [p.ele for p in points]
+    assert table.column("hr").to_pylist() == [p.hr for p in points]
+    assert table.column("source").to_pylist() == sources
+
+    metadata = read_columnar_metadata(output)
+    assert metadata["creator"] == "JMRF"
+    assert metadata["track_name"] == "Morning run"
+    assert metadata["provenance"] == [
+        {"file": "watch.gpx", "points": 10, "start": start.isoformat()}
+    ]
+
+
+def test_parquet_row_groups(tmp_path, make_points):
+    import pyarrow.parquet as pq
+
+    output = str(tmp_path / "merged.parquet")
+    write_columnar(output, make_points(20), ["a.gpx"] * 20, row_group_size=8)
+
+    assert pq.ParquetFile(output).num_row_groups == 3
+
+
+def test_write_columnar_errors(tmp_path, make_points):
+    with pytest.raises(ValueError):
+        write_columnar(str(tmp_path / "merged.parquet"), make_points(3), ["a.gpx"])
+
+    with pytest.raises(ValueError):
+        write_columnar(str(tmp_path / "merged.csv"), make_points(1), ["a.gpx"])
+
+
+def test_interpolate_zero_hr_points(start):
+    hrs = [0, 100, None, 0, 120, 0]
+    points = [Point((0, 0), None, start, hr) for hr in hrs]
+
+    interpolated = [p.hr for p in interpolate_zero_hr_points(points)]
+
+    assert interpolated == [100, 100, None, 110, 120, 120]
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from gptcx.dem import correct_elevation
+from gptcx.dem import DEMTileCache
+from gptcx.dem import hgt_tile_name
+from gptcx.dem import HGT_VOID
+
+
+SAMPLES = 1201
+
+
+def write_tile(dem_dir, lat, lon, values=None):
+    if values is None:
+        rows, cols = np.mgrid[0:SAMPLES, 0:SAMPLES]
+        values = rows * 2 + cols
+    tile_path = dem_dir / hgt_tile_name(lat, lon)
+    np.asarray(values).astype(">i2").tofile(str(tile_path))
+    return values
+
+
+def test_hgt_tile_name():
+    assert hgt_tile_name(45, 6) == "N45E006.hgt"
+    assert hgt_tile_name(-34, -59) == "S34W059.hgt"
+
+
+def test_lookup_bilinear(tmp_path):
+    values = write_tile(tmp_path, 45, 6)
+    cache = DEMTileCache(str(tmp_path))
+    step = 1 / (SAMPLES - 1)
+
+    lats = np.array([46.0 - 600 * step, 46.0 - 10.5 * step, np.nan, 47.5])
+    lons = np.array([6.0 + 600 * step, 6.0 + 20.25 * step, 6.5, 6.5])
+    elevations = cache.lookup(lats, lons)
+
+    assert elevations[0] == pytest.approx(values[600, 600])
+    assert elevations[1] == pytest.approx(10.5 * 2 + 20.25)
+    assert np.isnan(elevations[2])  # no position
+    assert np.isnan(elevations[3])  # no tile
+
+
+def test_lookup_tile_edges(tmp_path):
+    values = write_tile(tmp_path, 40, 6)
+    cache = DEMTileCache(str(tmp_path))
+
+    # north edge (row 0) and east edge (last column) of N40E006, whose
+    # neighbouring tiles (N41E006 / N40E007) are missing
+    lats = np.array([41.0, 40.5, 41.0, 40.0, 40.0])
+    lons = np.array([6.5, 7.0, 7.0, 6.0, 6.5])
+    elevations = cache.lookup(lats, lons)
+
+    assert elevations[0] == pytest.approx(values[0, 600])
+    assert elevations[1] == pytest.approx(values[600, SAMPLES - 1])
+    assert elevations[2] == pytest.approx(values[0, SAMPLES - 1])
+    assert elevations[3] == pytest.approx(values[SAMPLES - 1, 0])
+    assert elevations[4] == pytest.approx(values[SAMPLES - 1, 600])
+
+
+def test_lookup_voids(tmp_path):
+    values = np.full((SAMPLES, SAMPLES), 100)
+    values[10, 11] = HGT_VOID
+    write_tile(tmp_path, 45, 6, values)
+    cache = DEMTileCache(str(tmp_path))
+    step = 1 / (SAMPLES - 1)
+
+    # exactly on a sample next to the void: the void has zero weight
+    on_sample = cache.lookup([46.0 - 10 * step], [6.0 + 10 * step])
+    # between the samples: the void has a non-zero weight
+    between = cache.lookup([46.0 - 10.5 * step], [6.0 + 10.5 * step])
+
+    assert on_sample[0] == pytest.approx(100)
+    assert np.isnan(between[0])
+
+
+def test_missing_tiles_are_picked_up_later(tmp_path):
+    cache = DEMTileCache(str(tmp_path))
+    assert np.isnan(cache.lookup([45.5], [6.5])[0])
+
+    write_tile(tmp_path, 45, 6)
+    assert np.isfinite(cache.lookup([45.5], [6.5])[0])
+
+
+def test_lru_eviction(tmp_path):
+    for lon in (6, 7, 8):
+        write_tile(tmp_path, 45, lon)
+    tile_bytes = SAMPLES * SAMPLES * 2
+    cache = DEMTileCache(str(tmp_path), max_bytes=2 * tile_bytes)
+
+    cache.lookup([45.5, 45.5], [6.5, 7.5])
+    cache.lookup([45.5], [6.5])  # N45E006 is now the most recently used
+    cache.lookup([45.5], [8.5])
+
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * tile_bytes
+    assert cache.tile(45, 6) is not None
+    assert cache.hits == 2
+    assert cache.misses == 3
+
+
+def test_correct_elevation_modes(tmp_path):
+    write_tile(tmp_path, 45, 6, np.full((SAMPLES, SAMPLES), 500))
+    cache = DEMTileCache(str(tmp_path))
+    lats = np.array([45.1, 45.2, 45.3, 45.4])
+    lons = np.array([6.1, 6.2, 6.3, 6.4])
+    eles = np.array([510.0, 512.0, 480.0, np.nan])
+    sources = ["watch.gpx", "watch.gpx", "phone.tcx", "phone.tcx"]
+
+    replaced = correct_elevation(lats, lons, eles, cache, mode="replace")
+    offset = correct_elevation(lats, lons, eles, cache, "offset", sources)
+
+    np.testing.assert_allclose(replaced, [500, 500, 500, 500])
+    np.testing.assert_allclose(offset, [499, 501, 500, 500])
+
+    with pytest.raises(ValueError):
+        correct_elevation(lats, lons, eles, cache, mode="offset")
@@ -0,0 +1,135 @@
+import mmap
+import struct
+
+import numpy as np
+import pytest
+
+from gptcx import Point
+from gptcx.gpx import GPX
+from gptcx.snapshot import FORMAT_VERSION
+from gptcx.snapshot import is_snapshot
+from gptcx.snapshot import MAGIC
+from gptcx.snapshot import Snapshot
+from gptcx.tcx import TCX
+from gptcx.tcx import write_tcx
+
+
+def test_is_snapshot():
+    assert is_snapshot("merged.gptcx")
+    assert is_snapshot("merged.GPTCX")
+    assert not is_snapshot("merged.gpx")
+
+
+def test_gpx_snapshot_gpx(tmp_path, make_points):
+    points = make_points(20)
+    gpx = GPX.from_track_points(points, track_name="Morning", creator="JMRF")
+    gpx.to_file(str(tmp_path / "track.gpx"))
+
+    GPX.from_file(str(tmp_path / "track.gpx")).to_file(str(tmp_path / "track.gptcx"))
+    with Snapshot.from_file(str(tmp_path / "track.gptcx")) as snapshot:
+        assert len(snapshot) == 20
+        assert snapshot.creator == "JMRF"
+        assert snapshot.tracks == ["Morning"]
+        assert snapshot.sources == ["track.gpx"]
+        np.testing.assert_array_equal(
+            snapshot.hr_valid, [p.hr is not None for p in points]
+        )
+
+    restored = GPX.from_file(str(tmp_path / "track.gptcx"))
+    assert restored.source == "track.gptcx"
+    assert restored.gpx.creator == "JMRF"
+    assert restored.gpx.tracks[0].name == "Morning"
+    assert restored.track_points == points
+
+
+def test_tcx_snapshot_gpx(tmp_path, make_points):
+    points = [p._replace(hr=130 + i) for i, p in enumerate(make_points(10))]
+    write_tcx(str(tmp_path / "track.tcx"), points)
+
+    tcx = TCX.from_file(str(tmp_path / "track.tcx"))
+    GPX(tcx.to_gpx(), source="track.tcx").to_file(str(tmp_path / "track.gptcx"))
+    with Snapshot.from_file(str(tmp_path / "track.gptcx")) as snapshot:
+        assert snapshot.sources == ["track.tcx"]
+        assert snapshot.hr_valid.all()
+
+    restored = GPX.from_file(str(tmp_path / "track.gptcx")).track_points
+    assert [p.hr for p in restored] == [p.hr for p in points]
+    assert [p.time for p in restored] == [p.time for p in points]
+    for p, expected in zip(restored, points):
+        assert p.pos == pytest.approx(expected.pos)
+
+
+def test_snapshot_tcx(tmp_path, make_points):
+    # TCX.track_points zips the value lists, so keep every value present
+    points = [p._replace(ele=650.0, hr=130 + i) for i, p in enumerate(make_points(10))]
+    Snapshot.from_track_points(points, ["watch.gpx"] * 10).to_file(
+        str(tmp_path / "track.gptcx")
+    )
+
+    GPX.from_file(str(tmp_path / "track.gptcx")).to_file(str(tmp_path / "track.tcx"))
+    restored = TCX.from_file(str(tmp_path / "track.tcx")).track_points
+
+    assert [p.time for p in restored] == [p.time for p in points]
+    assert [p.hr for p in restored] == [p.hr for p in points]
+    for p, expected in zip(restored, points):
+        assert p.pos == pytest.approx(expected.pos)
+
+
+def test_missing_values(tmp_path, make_points):
+    points = make_points(4)
+    points[1] = Point((None, None), None, None, None)
+    Snapshot.from_track_points(points, ["watch.gpx"] * 4).to_file(
+        str(tmp_path / "track.gptcx")
+    )
+
+    with Snapshot.from_file(str(tmp_path / "track.gptcx")) as snapshot:
+        assert np.isnat(snapshot.columns["time"][1])
+        assert np.isnan(snapshot.columns["lat"][1])
+        assert np.isnan(snapshot.columns["ele"][0])
+        np.testing.assert_array_equal(snapshot.hr_valid, [False, False, False, True])
+        restored = snapshot.track_points
+
+    assert restored[1] == Point((None, None), None, None, None)
+    assert restored[0].ele is None
+    assert restored[3] == points[3]
+
+
+def test_close(tmp_path, make_points):
+    Snapshot.from_track_points(make_points(5), ["watch.gpx"] * 5).to_file(
+        str(tmp_path / "track.gptcx")
+    )
+
+    snapshot = Snapshot.from_file(str(tmp_path / "track.gptcx"))
+    assert not snapshot.columns["lat"].flags.writeable
+    snapshot.close()
+    assert len(snapshot) == 0
+    snapshot.close()
+
+
+def test_not_a_snapshot(tmp_path, monkeypatch):
+    (tmp_path / "track.gptcx").write_bytes(b"<gpx></gpx>" * 20)
+
+    # the file is unmapped before raising
+    buffers = []
+    mmap_class = mmap.mmap
+
+    def tracked_mmap(*args, **kwargs):
+        buffers.append(mmap_class(*args, **kwargs))
+        return buffers[-1]
+
+    monkeypatch.setattr(mmap, "mmap", tracked_mmap)
+    with pytest.raises(ValueError):
+        Snapshot.from_file(str(tmp_path / "track.gptcx"))
+
+    assert [buffer.closed for buffer in buffers] == [True]
+
+
+def test_newer_version(tmp_path, make_points):
+    snapshot_path = str(tmp_path / "track.gptcx")
+    Snapshot.from_track_points(make_points(3), ["watch.gpx"] * 3).to_file(snapshot_path)
+    with open(snapshot_path, "r+b") as f:
+        f.seek(len(MAGIC))
+        f.write(struct.pack("<H", FORMAT_VERSION + 1))
+
+    with pytest.raises(ValueError):
+        Snapshot.from_file(snapshot_path)
@@ -0,0 +1,148 @@
+import sys
+
+import numpy as np
+import pytest
+
+from gptcx.cli import get_args
+from gptcx.spatial import EARTH_RADIUS
+from gptcx.spatial import find_overlaps
+from gptcx.spatial import GridIndex
+from gptcx.spatial import haversine
+from gptcx.spatial import points_in_polygon
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(42)
+    lats = -33.95 + rng.random(20000) * 0.1
+    lons = 18.40 + rng.random(20000) * 0.1
+    lats[[3, 50]] = np.nan
+    return lats, lons
+
+
+def brute_force(mask):
+    return np.flatnonzero(mask)
+
+
+@pytest.mark.parametrize("cell_size", [None, 1e-3, 0.5])
+def test_bbox(points, cell_size):
+    lats, lons = points
+    index = GridIndex(lats, lons, cell_size=cell_size)
+    bbox = (-33.93, 18.42, -33.90, 18.47)
+
+    expected = brute_force(
+        (lats >= bbox[0]) & (lats <= bbox[2]) & (lons >= bbox[1]) & (lons <= bbox[3])
+    )
+
+    np.testing.assert_array_equal(index.bbox(bbox), expected)
+    assert len(index.bbox((10, 10, 11, 11))) == 0
+
+
+def test_polygon(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+    polygon = [(-33.94, 18.41), (-33.86, 18.43), (-33.90, 18.49), (-33.93, 18.46)]
+
+    expected = brute_force(points_in_polygon(lats, lons, polygon))
+
+    assert len(expected)
+    np.testing.assert_array_equal(index.polygon(polygon), expected)
+
+
+def test_radius(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+
+    expected = brute_force(haversine(-33.9, 18.45, lats, lons) <= 800)
+
+    assert len(expected)
+    np.testing.assert_array_equal(index.radius(-33.9, 18.45, 800), expected)
+
+
+def test_clip_invert(points):
+    lats, lons = points
+    index = GridIndex(lats, lons)
+
+    inside = index.clip(circle=(-33.9, 18.45, 800))
+    outside = index.clip(circle=(-33.9, 18.45, 800), invert=True)
+
+    assert len(inside) + len(outside) == len(lats)
+    assert not np.intersect1d(inside, outside).size
+
+
+def test_find_overlaps():
+    rng = np.random.default_rng(0)
+    # the same 2km stretch recorded by a watch and a phone (~5m of noise) and
+    # a ride somewhere else
+    road = np.linspace(0, 2000, 400) / EARTH_RADIUS
+    watch = (-33.9 + np.degrees(road), np.full(400, 18.4))
+    phone = (watch[0] + rng.normal(0, 5e-5, 400), watch[1] + rng.normal(0, 5e-5, 400))
+    other = (np.full(100, -34.5), np.linspace(19.0, 19.1, 100))
+
+    def overlaps_of(*tracks):
+        names = ["watch.gpx", "phone.tcx", "other.gpx"][: len(tracks)]
+        lats = np.concatenate([t[0] for t in tracks])
+        lons = np.concatenate([t[1] for t in tracks])
+        sources = [n for n, t in zip(names, tracks) for _ in t[0]]
+        return find_overlaps(lats, lons, sources, tolerance=25)
+
+    report = overlaps_of(watch, phone)
+    assert len(report) == 1
+    assert report[0]["files"] == ("phone.tcx", "watch.gpx")
+    assert report[0]["fraction"][0] > 0.95
+    assert report[0]["fraction"][1] > 0.95
+
+    # unrelated files don't change the overlap of the other two
+    assert overlaps_of(watch, phone, other) == report
+
+
+def test_find_overlaps_across_rows():
+    # Far from the meridian the columns of adjacent rows are shifted by more
+    # than a cell: points 5cm apart on either side of a row boundary still
+    # overlap
+    lat_step = np.degrees(25 / EARTH_RADIUS)
+    lat = 200152 * lat_step
+    lats = np.array([lat - np.degrees(0.025 / EARTH_RADIUS), lat])
+    lons = np.array([150.0, 150.0])
+
+    report = find_overlaps(lats, lons, ["a.gpx", "b.gpx"], tolerance=25)
+    assert [r["points"] for r in report] == [(1, 1)]
+
+    # A sparse north-south track near Sydney and a copy shifted ~10m east
+    track = np.arange(-33.9, -33.8, 2e-4)
+    shift = np.degrees(10 / EARTH_RADIUS) / np.cos(np.radians(-33.85))
+    lats = np.concatenate([track, track])
+    lons = np.repeat([151.2, 151.2 + shift], len(track))
+    sources = ["a.gpx"] * len(track) + ["b.gpx"] * len(track)
+
+    report = find_overlaps(lats, lons, sources, tolerance=25)
+    assert report[0]["points"] == (len(track), len(track))
+
+
+def test_find_overlaps_errors():
+    with pytest.raises(ValueError):
+        find_overlaps([0.0], [0.0], ["a.gpx", "b.gpx"])
+
+    with pytest.raises(ValueError):
+        find_overlaps([0.0], [0.0], ["a.gpx"], tolerance=0.1)
+
+
+def test_cli_polygon_southern_hemisphere(monkeypatch):
+    vertices = ["-33.9", "18.4", "-33.8", "18.4", "-33.8", "18.5"]
+    monkeypatch.setattr(
+        sys, "argv", ["run.py", "in", "out.gpx", "--polygon", *vertices]
+    )
+
+    args = get_args()
+
+    assert args.polygon == [(-33.9, 18.4), (-33.8, 18.4), (-33.8, 18.5)]
+
+
+def test_cli_polygon_needs_vertex_pairs(monkeypatch):
+    vertices = ["-33.9", "18.4", "-33.8", "18.4", "-33.8"]
+    monkeypatch.setattr(
+        sys, "argv", ["run.py", "in", "out.gpx", "--polygon", *vertices]
+    )
+
+    with pytest.raises(SystemExit):
+        get_args()